@@ -8,6 +8,8 @@ It demonstrates the core functionality of the user profile system.
 
 import sys
 import argparse
+import shlex
+from . import views
 from .views import (
     create_profile, get_profile, update_profile, delete_profile,
     list_profiles, add_activity, get_user_statistics
@@ -115,8 +117,28 @@ def cmd_delete(args):
     print(f"Message: {response['message']}")
 
 
-def main():
-    """Main entry point."""
+def cmd_batch(args):
+    """Handle batch command."""
+    parser = build_parser()
+    for line_number, line in enumerate(sys.stdin, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        try:
+            batch_args = parser.parse_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            print(f"Error: could not parse line {line_number}: {line}")
+            continue
+        
+        if batch_args.command in (None, 'batch'):
+            print(f"Error: line {line_number} is not a runnable command: {line}")
+            continue
+        batch_args.func(batch_args)
+
+
+def build_parser():
+    """Build the command-line argument parser."""
     parser = argparse.ArgumentParser(
         description="OctoFit Tracker Profile Management CLI"
     )
@@ -160,10 +182,23 @@ def main():
     delete_parser.add_argument('user_id', help='User ID')
     delete_parser.set_defaults(func=cmd_delete)
     
+    # Batch command
+    batch_parser = subparsers.add_parser(
+        'batch', help='Run many commands from stdin, one per line'
+    )
+    batch_parser.set_defaults(func=cmd_batch)
+    
+    return parser
+
+
+def main():
+    """Main entry point."""
+    parser = build_parser()
     args = parser.parse_args()
     
     if hasattr(args, 'func'):
         args.func(args)
+        views.storage.flush()
     else:
         parser.print_help()
 
@@ -16,6 +16,26 @@ class UserRole(Enum):
     GYM_TEACHER = "gym_teacher"
 
 
+# Plain dict lookup is much cheaper than calling UserRole(value)
+_ROLE_MAP = {role.value: role for role in UserRole}
+
+
+def _parse_role(role):
+    """
+    Convert a role string to a UserRole; UserRole values pass through.
+    
+    Raises:
+        ValueError: If role is not a supported role string or UserRole
+    """
+    if isinstance(role, UserRole):
+        return role
+    try:
+        return _ROLE_MAP[role]
+    except (KeyError, TypeError):
+        # TypeError covers unhashable values such as lists
+        raise ValueError(f"Invalid role. Must be 'student' or 'gym_teacher', got '{role}'")
+
+
 class ActivityEntry:
     """
     Represents a single activity logged by a user.
@@ -28,6 +48,11 @@ class ActivityEntry:
         notes (str): Optional notes about the activity
     """
     
+    __slots__ = (
+        'activity_type', 'duration_minutes', 'calories_burned', 'notes',
+        '_timestamp', '_timestamp_iso', '_cached_dict'
+    )
+    
     def __init__(self, activity_type, duration_minutes, calories_burned, notes=""):
         """
         Initialize an activity entry.
@@ -43,29 +68,87 @@ class ActivityEntry:
         self.calories_burned = calories_burned
         self.timestamp = datetime.now()
         self.notes = notes
+        self._cached_dict = None
+    
+    @property
+    def timestamp(self):
+        """datetime: When the activity was logged."""
+        if self._timestamp is None:
+            # Restored entries keep only the ISO string until first use
+            self._timestamp = datetime.fromisoformat(self._timestamp_iso)
+        return self._timestamp
+    
+    @timestamp.setter
+    def timestamp(self, value):
+        # Format once here rather than on every serialization
+        self._timestamp = value
+        self._timestamp_iso = value.isoformat()
+        self._cached_dict = None
     
     def to_dict(self):
-        """Convert activity entry to dictionary format."""
+        """
+        Convert activity entry to dictionary format.
+        
+        Entries are treated as immutable once logged, so the dictionary is
+        built on first use and the same object is returned afterwards.
+        Callers must not modify it.
+        """
+        if self._cached_dict is None:
+            self._cached_dict = self._compute_dict()
+        return self._cached_dict
+    
+    def _compute_dict(self):
+        """Build the dictionary representation of this entry."""
         return {
             "activity_type": self.activity_type,
             "duration_minutes": self.duration_minutes,
             "calories_burned": self.calories_burned,
-            "timestamp": self.timestamp.isoformat(),
+            "timestamp": self._timestamp_iso,
             "notes": self.notes
         }
     
     @classmethod
     def from_dict(cls, data):
         """Create an activity entry from dictionary format."""
-        entry = cls(
-            activity_type=data.get("activity_type"),
-            duration_minutes=data.get("duration_minutes"),
-            calories_burned=data.get("calories_burned"),
-            notes=data.get("notes", "")
-        )
-        # Restore the original timestamp if provided
-        if "timestamp" in data:
-            entry.timestamp = datetime.fromisoformat(data["timestamp"])
+        timestamp = data.get("timestamp")
+        if timestamp is None:
+            return cls(
+                activity_type=data.get("activity_type"),
+                duration_minutes=data.get("duration_minutes"),
+                calories_burned=data.get("calories_burned"),
+                notes=data.get("notes", "")
+            )
+        
+        # Restore the original timestamp without going through __init__,
+        # which would take and format a fresh one only to discard it; it is
+        # only parsed into a datetime if something reads entry.timestamp
+        entry = object.__new__(cls)
+        entry.activity_type = data.get("activity_type")
+        entry.duration_minutes = data.get("duration_minutes")
+        entry.calories_burned = data.get("calories_burned")
+        entry.notes = data.get("notes", "")
+        entry._timestamp = None
+        entry._timestamp_iso = timestamp
+        entry._cached_dict = None
+        return entry
+    
+    @classmethod
+    def _from_trusted(cls, data):
+        """
+        Create an activity entry from a dictionary previously produced by
+        to_dict(), skipping __init__.
+        
+        The dictionary is adopted as the entry's cached to_dict() result,
+        so it must not be modified or reused by the caller.
+        """
+        entry = object.__new__(cls)
+        entry.activity_type = data["activity_type"]
+        entry.duration_minutes = data["duration_minutes"]
+        entry.calories_burned = data["calories_burned"]
+        entry.notes = data["notes"]
+        entry._timestamp = None
+        entry._timestamp_iso = data["timestamp"]
+        entry._cached_dict = data
         return entry
 
 
@@ -78,10 +161,18 @@ class UserProfile:
         name (str): Full name of the user
         age (int): Age of the user
         role (UserRole): Role of the user (student or gym_teacher)
-        activity_history (list): List of ActivityEntry objects
+        activity_history (list): List of ActivityEntry objects; extend it only
+            through add_activity(), append_activity() or extend_activities()
+            so the cached statistics stay in sync
         created_at (datetime): When the profile was created
     """
     
+    __slots__ = (
+        'user_id', 'name', 'age', 'role', 'activity_history',
+        '_created_at', '_created_at_iso', '_dict_cache',
+        '_total_activities', '_total_minutes', '_total_calories'
+    )
+    
     def __init__(self, user_id, name, age, role):
         """
         Initialize a user profile.
@@ -104,16 +195,51 @@ class UserProfile:
         self.age = age
         
         # Handle role - convert string to enum if needed
-        if isinstance(role, str):
-            try:
-                self.role = UserRole(role)
-            except ValueError:
-                raise ValueError(f"Invalid role. Must be 'student' or 'gym_teacher', got '{role}'")
-        else:
-            self.role = role
+        self.role = _parse_role(role)
         
         self.activity_history = []
         self.created_at = datetime.now()
+        self._dict_cache = None
+        
+        # Running totals so statistics don't rescan the activity history
+        self._total_activities = 0
+        self._total_minutes = 0
+        self._total_calories = 0
+    
+    def update(self, **fields):
+        """
+        Update profile fields.
+        
+        All values are validated before any is applied, and the cached
+        dictionary is only invalidated when something actually changes.
+        
+        Args:
+            **fields: Fields to update (name, age, role); others are ignored
+        
+        Returns:
+            bool: True if any field changed
+        
+        Raises:
+            ValueError: If age is invalid or role is not supported
+        """
+        if 'age' in fields:
+            if not isinstance(fields['age'], int) or fields['age'] < 0 or fields['age'] > 150:
+                raise ValueError("Age must be a valid integer between 0 and 150")
+        role = _parse_role(fields['role']) if 'role' in fields else self.role
+        
+        changed = False
+        if 'name' in fields and fields['name'] != self.name:
+            self.name = fields['name']
+            changed = True
+        if 'age' in fields and fields['age'] != self.age:
+            self.age = fields['age']
+            changed = True
+        if role is not self.role:
+            self.role = role
+            changed = True
+        if changed:
+            self._dict_cache = None
+        return changed
     
     def add_activity(self, activity_type, duration_minutes, calories_burned, notes=""):
         """
@@ -129,39 +255,96 @@ class UserProfile:
             ActivityEntry: The newly created activity entry
         """
         activity = ActivityEntry(activity_type, duration_minutes, calories_burned, notes)
-        self.activity_history.append(activity)
+        self.append_activity(activity)
         return activity
     
+    def append_activity(self, activity):
+        """
+        Append an existing activity entry, e.g. one restored from storage.
+        
+        Args:
+            activity (ActivityEntry): The entry to append
+        """
+        self.activity_history.append(activity)
+        self._total_activities += 1
+        self._total_minutes += activity.duration_minutes
+        self._total_calories += activity.calories_burned
+        self._dict_cache = None
+    
+    def extend_activities(self, activities):
+        """
+        Append several existing activity entries at once.
+        
+        Args:
+            activities (list): ActivityEntry objects to append, in order
+        """
+        self.activity_history.extend(activities)
+        self._total_activities += len(activities)
+        self._total_minutes += sum(a.duration_minutes for a in activities)
+        self._total_calories += sum(a.calories_burned for a in activities)
+        self._dict_cache = None
+    
+    @property
+    def created_at(self):
+        """datetime: When the profile was created."""
+        if self._created_at is None:
+            # Restored profiles keep only the ISO string until first use
+            self._created_at = datetime.fromisoformat(self._created_at_iso)
+        return self._created_at
+    
+    @created_at.setter
+    def created_at(self, value):
+        # Format once here rather than on every serialization
+        self._created_at = value
+        self._created_at_iso = value.isoformat()
+        self._dict_cache = None
+    
     def get_total_activities(self):
         """Get the total number of activities logged."""
-        return len(self.activity_history)
+        return self._total_activities
     
     def get_total_activity_time(self):
         """Get the total time spent on activities (in minutes)."""
-        return sum(activity.duration_minutes for activity in self.activity_history)
+        return self._total_minutes
     
     def get_total_calories_burned(self):
         """Get the total calories burned across all activities."""
-        return sum(activity.calories_burned for activity in self.activity_history)
+        return self._total_calories
+    
+    def get_stats(self):
+        """Get the activity totals as a dictionary."""
+        return {
+            "total_activities": self._total_activities,
+            "total_activity_time_minutes": self._total_minutes,
+            "total_calories_burned": self._total_calories
+        }
     
     def get_activity_history(self):
         """Get the complete activity history."""
         return self.activity_history
     
     def to_dict(self):
-        """Convert user profile to dictionary format."""
+        """
+        Convert user profile to dictionary format.
+        
+        The result is cached until the profile is changed through update(),
+        add_activity(), append_activity() or extend_activities(). Callers must
+        not modify it.
+        """
+        if self._dict_cache is None:
+            self._dict_cache = self._compute_dict()
+        return self._dict_cache
+    
+    def _compute_dict(self):
+        """Build the dictionary representation of this profile."""
         return {
             "user_id": self.user_id,
             "name": self.name,
             "age": self.age,
             "role": self.role.value,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self._created_at_iso,
             "activity_history": [activity.to_dict() for activity in self.activity_history],
-            "stats": {
-                "total_activities": self.get_total_activities(),
-                "total_activity_time_minutes": self.get_total_activity_time(),
-                "total_calories_burned": self.get_total_calories_burned()
-            }
+            "stats": self.get_stats()
         }
     
     @classmethod
@@ -174,14 +357,40 @@ class UserProfile:
             role=data.get("role")
         )
         
-        # Restore created_at if provided
+        # Restore created_at if provided; parsed lazily like timestamps
         if "created_at" in data:
-            profile.created_at = datetime.fromisoformat(data["created_at"])
+            profile._created_at = None
+            profile._created_at_iso = data["created_at"]
         
         # Restore activity history
         if "activity_history" in data:
             for activity_data in data["activity_history"]:
-                activity = ActivityEntry.from_dict(activity_data)
-                profile.activity_history.append(activity)
+                profile.append_activity(ActivityEntry.from_dict(activity_data))
+        
+        return profile
+    
+    @classmethod
+    def _from_trusted(cls, data):
+        """
+        Create a user profile from a dictionary previously produced by
+        to_dict(), skipping validation and __init__.
+        
+        Used when loading storage, whose contents were validated when they
+        were written. The dictionary is adopted as the profile's cached
+        to_dict() result, so it must not be modified or reused by the caller.
+        """
+        profile = object.__new__(cls)
+        profile.user_id = data["user_id"]
+        profile.name = data["name"]
+        profile.age = data["age"]
+        profile.role = _ROLE_MAP[data["role"]]
+        profile._created_at = None
+        profile._created_at_iso = data["created_at"]
         
+        history = [ActivityEntry._from_trusted(a) for a in data["activity_history"]]
+        profile.activity_history = history
+        profile._total_activities = len(history)
+        profile._total_minutes = sum(a.duration_minutes for a in history)
+        profile._total_calories = sum(a.calories_burned for a in history)
+        profile._dict_cache = data
         return profile
@@ -18,15 +18,10 @@ class ActivitySerializer:
             activity: ActivityEntry object
         
         Returns:
-            dict: Serialized activity data
+            dict: Serialized activity data (shared with the entry's to_dict()
+            cache, so it must not be modified)
         """
-        return {
-            "activity_type": activity.activity_type,
-            "duration_minutes": activity.duration_minutes,
-            "calories_burned": activity.calories_burned,
-            "timestamp": activity.timestamp.isoformat(),
-            "notes": activity.notes
-        }
+        return activity.to_dict()
     
     @staticmethod
     def serialize_many(activities):
@@ -46,26 +41,61 @@ class UserProfileSerializer:
             profile: UserProfile object
         
         Returns:
-            dict: Serialized profile data
+            dict: Serialized profile data (shared with the profile's to_dict()
+            cache, so it must not be modified)
+        """
+        return profile.to_dict()
+    
+    @staticmethod
+    def serialize_many(profiles):
+        """
+        Serialize multiple user profiles with their full activity history.
+        
+        List endpoints should use serialize_list_view() instead, which does
+        not walk any activity history.
+        """
+        return [UserProfileSerializer.serialize(profile) for profile in profiles]
+    
+    @staticmethod
+    def serialize_add_activity_response(profile, new_activity):
+        """
+        Serialize the response for a newly added activity.
+        
+        Only the new entry and the profile's running totals are included,
+        so the cost does not grow with the activity history.
+        
+        Args:
+            profile: UserProfile object the activity was added to
+            new_activity: The ActivityEntry that was just added
+        
+        Returns:
+            dict: user_id, latest_activity and stats
         """
         return {
             "user_id": profile.user_id,
-            "name": profile.name,
-            "age": profile.age,
-            "role": profile.role.value,
-            "created_at": profile.created_at.isoformat(),
-            "activity_history": ActivitySerializer.serialize_many(profile.activity_history),
-            "stats": {
-                "total_activities": profile.get_total_activities(),
-                "total_activity_time_minutes": profile.get_total_activity_time(),
-                "total_calories_burned": profile.get_total_calories_burned()
-            }
+            "latest_activity": new_activity.to_dict(),
+            "stats": profile.get_stats()
         }
     
     @staticmethod
-    def serialize_many(profiles):
-        """Serialize multiple user profiles."""
-        return [UserProfileSerializer.serialize(profile) for profile in profiles]
+    def serialize_add_activities_response(profile, new_activities):
+        """
+        Serialize the response for a batch of newly added activities.
+        
+        Like serialize_add_activity_response(), but for several entries.
+        
+        Args:
+            profile: UserProfile object the activities were added to
+            new_activities: The ActivityEntry objects that were just added
+        
+        Returns:
+            dict: user_id, added_activities and stats
+        """
+        return {
+            "user_id": profile.user_id,
+            "added_activities": ActivitySerializer.serialize_many(new_activities),
+            "stats": profile.get_stats()
+        }
     
     @staticmethod
     def serialize_list_view(profiles):
@@ -81,3 +111,6 @@ class UserProfileSerializer:
             }
             for profile in profiles
         ]
+    
+    # Explicit name for the serializer list endpoints should use
+    serialize_many_minimal = serialize_list_view
@@ -2,54 +2,498 @@
 OctoFit Tracker Storage Management
 
 This module provides file-based and in-memory storage for user profiles.
-It handles persistence of profile data in JSON format.
+It handles persistence of profile data as a JSON-Lines change log.
 """
 
+import atexit
 import json
 import os
-from typing import Dict, Optional, List
-from .models import UserProfile
+import threading
+from sys import intern
+from collections import defaultdict
+from typing import Dict, Optional, List, Tuple, Union
+from .models import ActivityEntry, UserProfile, UserRole
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# Record (de)serialization; orjson is used when installed since it is
+# considerably faster than the stdlib encoder for large logs
+if orjson is not None:
+    def _dumps_line(obj) -> bytes:
+        # orjson appends the newline itself, saving a copy per record
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps_line(obj) -> bytes:
+        return _dumps(obj) + b'\n'
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    _loads = json.loads
+
+
+# Default for dict.pop() that can't be confused with a stored value
+_MISSING = object()
+
+# Keys a stored profile dict needs before it can be indexed and materialized
+_STORED_PROFILE_KEYS = ("user_id", "name", "age", "role", "created_at", "activity_history")
+_ROLE_VALUES = frozenset(role.value for role in UserRole)
 
 
 class ProfileStorage:
     """
     File-based storage manager for user profiles using JSON.
     
-    This class handles reading and writing user profiles to disk,
-    maintaining an in-memory cache for faster access.
+    Profiles are persisted as an append-only JSON-Lines log: every mutation
+    is written as one record describing just that change, and the log is
+    compacted into a single snapshot record once it grows to several times
+    the size of the last snapshot. Records are buffered and written in
+    batches through one append handle that stays open; call flush() to
+    force them to disk. Pending records are also flushed automatically at
+    interpreter exit. With flush_interval set, a background thread flushes
+    them instead, so mutations only wait on disk writes while the log is
+    being compacted.
+    
+    One instance is meant to be shared by every request. Mutations are
+    serialized by an internal lock; lookups only take it the first time a
+    stored profile is built, and listings leave out profiles deleted while
+    they were being collected. Flushes write outside that lock, under a
+    separate I/O lock that keeps batches in the order they were queued.
+    
+    Loading only parses the log; stored profiles are turned into
+    UserProfile objects the first time they are accessed, so commands that
+    touch a single user don't pay to build every profile.
+    
+    With storage_format='msgpack' the same records are stored as a stream
+    of MessagePack objects instead, which is smaller and faster to encode
+    than JSON but not human-readable.
+    
+    Record formats:
+        {"op": "snapshot", "profiles": {user_id: profile_dict, ...}}
+        {"op": "upsert", "user_id": ..., "profile": profile_dict}
+        {"op": "update", "user_id": ..., "fields": {"name": ..., ...}}
+        {"op": "activity", "user_id": ..., "activity": activity_dict}
+        {"op": "activities", "user_id": ..., "activities": [activity_dict, ...]}
+        {"op": "delete", "user_id": ...}
     """
     
-    def __init__(self, storage_file="profiles.json"):
+    # Compact once the log is this many times the size of the last snapshot
+    COMPACTION_RATIO = 4
+    # ...but never bother compacting logs smaller than this many bytes
+    MIN_COMPACTION_BYTES = 64 * 1024
+    
+    STORAGE_FORMATS = ('json', 'msgpack')
+    
+    def __init__(self, storage_file="profiles.json", autoflush_threshold=64,
+                 storage_format='json', flush_interval=None):
         """
         Initialize the profile storage.
         
         Args:
-            storage_file (str): Path to the JSON file for storing profiles
+            storage_file (str): Path to the log file for storing profiles
+            autoflush_threshold (int): Number of pending records that
+                triggers an automatic flush
+            storage_format (str): 'json' (default) or 'msgpack'
+            flush_interval (float): If set, flush pending records from a
+                background thread at least this often (in seconds)
+        
+        Raises:
+            ValueError: If storage_format is not supported
+            ImportError: If 'msgpack' is requested but not installed
         """
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Invalid storage format. Must be 'json' or 'msgpack', got '{storage_format}'")
+        if storage_format == 'msgpack' and msgpack is None:
+            raise ImportError("The 'msgpack' storage format requires the msgpack package")
+        
         self.storage_file = storage_file
-        self.profiles: Dict[str, UserProfile] = {}
+        self.storage_format = storage_format
+        # user_id -> UserProfile, or the stored profile dict until first access
+        self._profiles: Dict[str, Union[UserProfile, dict]] = {}
+        # role value -> user_ids with that role; dicts keep insertion order
+        self._by_role: Dict[str, Dict[str, None]] = defaultdict(dict)
+        self._pending: List[dict] = []
+        self._log_file = None
+        self._log_bytes = 0
+        self._snapshot_bytes = 0
+        self._needs_compaction = False
+        self._autoflush_threshold = autoflush_threshold
+        self._lock = threading.RLock()
+        # Guards the log file; taken after self._lock, never before it
+        self._io_lock = threading.Lock()
+        self._flush_needed = threading.Condition(self._lock)
+        self._flush_interval = flush_interval
+        self._closed = False
         self.load_all()
+        atexit.register(self.close)
+        
+        if flush_interval is not None:
+            threading.Thread(
+                target=self._flush_loop, name="ProfileStorage-flusher", daemon=True
+            ).start()
     
     def load_all(self):
-        """Load all profiles from storage file."""
-        if os.path.exists(self.storage_file):
+        """
+        Load all profiles by replaying the storage file.
+        
+        Pending records are flushed first, so reloading a live instance
+        doesn't drop changes that haven't been written yet.
+        """
+        with self._lock:
+            self.flush()
+            with self._io_lock:
+                self._close_log_file()
+            self._profiles = {}
+            self._by_role.clear()
+            self._pending = []
+            self._log_bytes = 0
+            self._snapshot_bytes = 0
+            self._needs_compaction = False
+            if not os.path.exists(self.storage_file):
+                return
+            
+            with open(self.storage_file, 'rb') as f:
+                records = self._load(f)
+            
             try:
-                with open(self.storage_file, 'r') as f:
-                    data = json.load(f)
-                    for user_id, profile_data in data.items():
-                        self.profiles[user_id] = UserProfile.from_dict(profile_data)
-            except (json.JSONDecodeError, ValueError) as e:
+                for record in records:
+                    self._replay(record)
+            except (KeyError, TypeError, ValueError) as e:
                 print(f"Error loading profiles: {e}")
-                self.profiles = {}
+                self._profiles = {}
+            # Treat the file as loaded as the baseline for the next compaction
+            self._log_bytes = self._snapshot_bytes = os.path.getsize(self.storage_file)
+            self._rebuild_role_index()
+    
+    def _rebuild_role_index(self):
+        """Rebuild the role index from the loaded profiles."""
+        self._by_role.clear()
+        for user_id, profile in self._profiles.items():
+            self._by_role[self._role_of(profile)][user_id] = None
+    
+    @staticmethod
+    def _role_of(profile: Union[UserProfile, dict]) -> str:
+        """Get the role value of a loaded or not-yet-loaded profile."""
+        if type(profile) is dict:
+            return profile["role"]
+        return profile.role.value
+    
+    def _materialize(self, user_id: str) -> Optional[UserProfile]:
+        """Get a profile, building it from its stored dict on first access."""
+        profile = self._profiles.get(user_id)
+        if type(profile) is dict:
+            # Readers don't hold the lock, so two of them could build the same
+            # profile and one would replace the other's object, losing any
+            # change a mutator made to it; only the first build is kept
+            with self._lock:
+                profile = self._profiles.get(user_id)
+                if type(profile) is dict:
+                    profile = self._profiles[user_id] = UserProfile._from_trusted(profile)
+        return profile
+    
+    def _load(self, f) -> List[dict]:
+        """Read every record from an open storage file."""
+        if self.storage_format == 'msgpack':
+            try:
+                # A record torn by an interrupted append is silently dropped
+                return list(msgpack.Unpacker(f, raw=False))
+            except ValueError as e:
+                print(f"Error loading profiles: {e}")
+                return []
+        
+        if self._is_legacy_document(f):
+            legacy = self._load_legacy_document(f)
+            if legacy is not None:
+                self._needs_compaction = True
+                return [{"op": "snapshot", "profiles": legacy}]
+            f.seek(0)
+        
+        lines = f.readlines()
+        try:
+            return [_loads(line) for line in lines if line.strip()]
+        except json.JSONDecodeError:
+            return self._parse_log_leniently(lines)
+    
+    @staticmethod
+    def _is_legacy_document(f) -> bool:
+        """
+        Check whether an open storage file uses the older single-document
+        JSON format rather than the change log. The file is rewound.
+        """
+        first_line = f.readline()
+        f.seek(0)
+        if not first_line.strip():
+            return False
+        try:
+            first = _loads(first_line)
+        except json.JSONDecodeError:
+            # Log lines are complete JSON objects; an indented document isn't
+            return True
+        return isinstance(first, dict) and "op" not in first
+    
+    @staticmethod
+    def _load_legacy_document(f) -> Optional[dict]:
+        """
+        Read a single-document JSON file, or return None if it is malformed.
+        
+        With ijson installed the document is streamed one profile at a time
+        instead of reading the whole file into memory before parsing it.
+        """
+        if ijson is not None:
+            try:
+                return dict(ijson.kvitems(f, '', use_float=True))
+            except ijson.JSONError:
+                return None
+        try:
+            return _loads(f.read())
+        except json.JSONDecodeError:
+            return None
+    
+    def _dump(self, record: dict) -> bytes:
+        """Encode a single record in the configured storage format."""
+        if self.storage_format == 'msgpack':
+            return msgpack.packb(record, use_bin_type=True)
+        return _dumps_line(record)
+    
+    @staticmethod
+    def _parse_log_leniently(lines: List[bytes]) -> List[dict]:
+        """
+        Parse a log that failed strict parsing, dropping malformed records
+        such as a torn trailing record left behind by an interrupted append.
+        """
+        records = []
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(_loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Error loading profiles: skipping line {line_number}: {e}")
+        return records
+    
+    def _replay(self, record: dict):
+        """Apply a single log record to the in-memory profiles."""
+        op = record["op"]
+        if op == "snapshot":
+            self._profiles = {intern(user_id): profile
+                              for user_id, profile in record["profiles"].items()
+                              if self._is_valid_stored_profile(user_id, profile)}
+        elif op == "upsert":
+            if self._is_valid_stored_profile(record["user_id"], record["profile"]):
+                self._profiles[intern(record["user_id"])] = record["profile"]
+        elif op in ("update", "activity", "activities"):
+            profile = self._materialize(record["user_id"])
+            if profile is None:
+                # The profile's own record was lost, e.g. skipped as malformed
+                print(f"Error loading profiles: skipping '{op}' record for "
+                      f"unknown user_id '{record['user_id']}'")
+            elif op == "update":
+                profile.update(**record["fields"])
+            elif op == "activity":
+                profile.append_activity(ActivityEntry._from_trusted(record["activity"]))
+            else:
+                profile.extend_activities([ActivityEntry._from_trusted(a) for a in record["activities"]])
+        elif op == "delete":
+            self._profiles.pop(record["user_id"], None)
+        else:
+            raise ValueError(f"Unknown storage record op '{op}'")
+    
+    @staticmethod
+    def _is_valid_stored_profile(user_id: str, profile) -> bool:
+        """
+        Check a stored profile dict before it is indexed, reporting and
+        rejecting incomplete ones. Profiles are only fully built on first
+        access, so this is what keeps a bad entry from failing the load.
+        """
+        if not isinstance(profile, dict):
+            problem = "not an object"
         else:
-            self.profiles = {}
+            missing = [key for key in _STORED_PROFILE_KEYS if key not in profile]
+            if missing:
+                problem = f"missing {', '.join(missing)}"
+            elif not isinstance(profile["role"], str) or profile["role"] not in _ROLE_VALUES:
+                problem = f"invalid role '{profile['role']}'"
+            else:
+                return True
+        print(f"Error loading profiles: skipping profile '{user_id}': {problem}")
+        return False
+    
+    def append_record(self, op: str, user_id: str, payload: Optional[dict] = None):
+        """
+        Queue a mutation record for the storage log.
+        
+        Args:
+            op (str): Record operation ('upsert', 'update', 'activity',
+                'activities' or 'delete')
+            user_id (str): The user ID the record applies to
+            payload (dict): Operation-specific fields merged into the record
+        """
+        record = {"op": op, "user_id": user_id}
+        if payload:
+            record.update(payload)
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self._autoflush_threshold:
+                if self._flush_interval is None:
+                    self.flush()
+                else:
+                    self._flush_needed.notify()
+    
+    def _flush_loop(self):
+        """Background thread body: flush on every interval or when notified."""
+        while True:
+            with self._flush_needed:
+                if self._closed:
+                    return
+                self._flush_needed.wait(self._flush_interval)
+                if self._closed:
+                    # close() writes whatever is left itself
+                    return
+            # Flush without holding the lock so mutators can keep going
+            self.flush()
     
-    def save_all(self):
-        """Save all profiles to storage file."""
-        data = {user_id: profile.to_dict() for user_id, profile in self.profiles.items()}
-        os.makedirs(os.path.dirname(self.storage_file) or '.', exist_ok=True)
-        with open(self.storage_file, 'w') as f:
-            json.dump(data, f, indent=2)
+    def flush(self):
+        """
+        Append all pending records to the storage file in a single write.
+        
+        The pending batch is swapped out under the lock and written after
+        releasing it, so mutations from other threads don't wait for the
+        write and fsync. Mutations that flush themselves (every
+        autoflush_threshold records, without flush_interval) still do.
+        
+        If the write fails the batch is not queued again, since part of it
+        may have reached the file; the next flush compacts instead, writing
+        a fresh snapshot of the in-memory profiles.
+        """
+        with self._lock:
+            if self._needs_compaction:
+                self.compact()
+                return
+            if not self._pending:
+                return
+            
+            pending, self._pending = self._pending, []
+            # Taking the I/O lock before letting go of the main lock keeps
+            # concurrent flushes writing their batches in queue order
+            self._io_lock.acquire()
+        
+        try:
+            self._append_to_log(pending)
+        except OSError:
+            # Some of the batch may already be in the file, and replaying
+            # activity records twice would double count them, so rather than
+            # retrying it rewrite the file from memory on the next flush
+            self._needs_compaction = True
+            self._discard_log_file()
+            raise
+        finally:
+            self._io_lock.release()
+        
+        if self._log_bytes > max(self.COMPACTION_RATIO * self._snapshot_bytes,
+                                 self.MIN_COMPACTION_BYTES):
+            self.compact()
+    
+    def _append_to_log(self, records: List[dict]):
+        """Write records to the end of the log and fsync; needs self._io_lock."""
+        if self._log_file is None:
+            os.makedirs(os.path.dirname(self.storage_file) or '.', exist_ok=True)
+            self._log_file = open(self.storage_file, 'ab')
+        data = b''.join(self._dump(record) for record in records)
+        self._log_file.write(data)
+        self._log_file.flush()
+        os.fsync(self._log_file.fileno())
+        self._log_bytes += len(data)
+    
+    def close(self):
+        """Flush pending records, stop the background flusher and close the file."""
+        with self._lock:
+            self._closed = True
+            self._flush_needed.notify()
+            self.flush()
+            with self._io_lock:
+                self._close_log_file()
+    
+    def _discard_log_file(self):
+        """Drop the append handle after a failed write; needs self._io_lock."""
+        log_file, self._log_file = self._log_file, None
+        if log_file is not None:
+            try:
+                log_file.close()
+            except OSError:
+                pass
+    
+    def _close_log_file(self):
+        """Close the append handle, if one is open; needs self._io_lock."""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+    
+    def _snapshot_chunks(self):
+        """
+        Encode a snapshot record of all profiles piece by piece.
+        
+        Yields the record one profile at a time so compaction never holds
+        the encoding of the whole store in memory. Concatenated, the chunks
+        decode to {"op": "snapshot", "profiles": {...}} like any other record.
+        """
+        profiles = self._profiles
+        if self.storage_format == 'msgpack':
+            packer = msgpack.Packer(use_bin_type=True)
+            yield (packer.pack_map_header(2) + packer.pack("op") + packer.pack("snapshot")
+                   + packer.pack("profiles") + packer.pack_map_header(len(profiles)))
+            for user_id, profile in profiles.items():
+                data = profile if type(profile) is dict else profile.to_dict()
+                yield packer.pack(user_id) + packer.pack(data)
+            return
+        
+        yield b'{"op":"snapshot","profiles":{'
+        separator = b''
+        for user_id, profile in profiles.items():
+            data = profile if type(profile) is dict else profile.to_dict()
+            yield separator + _dumps(user_id) + b':' + _dumps(data)
+            separator = b','
+        yield b'}}\n'
+    
+    def compact(self):
+        """
+        Atomically rewrite the storage file as a single snapshot record.
+        
+        Holds the main lock throughout, so the snapshot matches the
+        in-memory profiles exactly; mutations wait until it is done.
+        """
+        with self._lock, self._io_lock:
+            os.makedirs(os.path.dirname(self.storage_file) or '.', exist_ok=True)
+            tmp_file = self.storage_file + '.tmp'
+            size = 0
+            with open(tmp_file, 'wb') as f:
+                # The file's buffer batches the small per-profile chunks
+                for chunk in self._snapshot_chunks():
+                    f.write(chunk)
+                    size += len(chunk)
+                # Make sure the snapshot is on disk before it replaces the log,
+                # otherwise a crash right after the rename can leave it empty
+                f.flush()
+                os.fsync(f.fileno())
+            # The append handle would still point at the replaced file
+            self._close_log_file()
+            os.replace(tmp_file, self.storage_file)
+            self._log_bytes = self._snapshot_bytes = size
+            self._pending = []
+            self._needs_compaction = False
     
     def create_profile(self, user_id: str, name: str, age: int, role: str) -> UserProfile:
         """
@@ -67,13 +511,15 @@ class ProfileStorage:
         Raises:
             ValueError: If user_id already exists or invalid parameters
         """
-        if user_id in self.profiles:
-            raise ValueError(f"Profile with user_id '{user_id}' already exists")
-        
-        profile = UserProfile(user_id, name, age, role)
-        self.profiles[user_id] = profile
-        self.save_all()
-        return profile
+        with self._lock:
+            if user_id in self._profiles:
+                raise ValueError(f"Profile with user_id '{user_id}' already exists")
+            
+            profile = UserProfile(user_id, name, age, role)
+            self._profiles[user_id] = profile
+            self._by_role[profile.role.value][user_id] = None
+            self.append_record("upsert", user_id, {"profile": profile.to_dict()})
+            return profile
     
     def get_profile(self, user_id: str) -> Optional[UserProfile]:
         """
@@ -85,7 +531,25 @@ class ProfileStorage:
         Returns:
             UserProfile: The user profile if found, None otherwise
         """
-        return self.profiles.get(user_id)
+        return self._materialize(user_id)
+    
+    def get_profiles_bulk(self, user_ids: List[str]) -> Dict[str, UserProfile]:
+        """
+        Retrieve several user profiles at once.
+        
+        Args:
+            user_ids (list): The user IDs to retrieve
+        
+        Returns:
+            Dict[str, UserProfile]: Found profiles keyed by user ID; unknown
+            IDs are left out
+        """
+        found = {}
+        for user_id in user_ids:
+            profile = self._materialize(user_id)
+            if profile is not None:
+                found[user_id] = profile
+        return found
     
     def update_profile(self, user_id: str, **kwargs) -> Optional[UserProfile]:
         """
@@ -98,26 +562,27 @@ class ProfileStorage:
         Returns:
             UserProfile: The updated profile if found, None otherwise
         """
-        profile = self.get_profile(user_id)
-        if not profile:
-            return None
-        
-        # Update allowed fields
-        if 'name' in kwargs:
-            profile.name = kwargs['name']
-        if 'age' in kwargs:
-            if not isinstance(kwargs['age'], int) or kwargs['age'] < 0 or kwargs['age'] > 150:
-                raise ValueError("Age must be a valid integer between 0 and 150")
-            profile.age = kwargs['age']
-        if 'role' in kwargs:
-            from .models import UserRole
-            if isinstance(kwargs['role'], str):
-                profile.role = UserRole(kwargs['role'])
-            else:
-                profile.role = kwargs['role']
-        
-        self.save_all()
-        return profile
+        with self._lock:
+            profile = self.get_profile(user_id)
+            if not profile:
+                return None
+            
+            # Update allowed fields; the profile validates everything before
+            # changing anything, so a ValueError leaves it untouched
+            old_role = profile.role
+            if not profile.update(**kwargs):
+                # Idempotent updates leave the cached dict and the log alone
+                return profile
+            
+            if profile.role is not old_role:
+                self._by_role[old_role.value].pop(user_id, None)
+                self._by_role[profile.role.value][user_id] = None
+            
+            fields = {key: kwargs[key] for key in ('name', 'age') if key in kwargs}
+            if 'role' in kwargs:
+                fields['role'] = profile.role.value
+            self.append_record("update", user_id, {"fields": fields})
+            return profile
     
     def delete_profile(self, user_id: str) -> bool:
         """
@@ -129,15 +594,25 @@ class ProfileStorage:
         Returns:
             bool: True if deleted, False if not found
         """
-        if user_id in self.profiles:
-            del self.profiles[user_id]
-            self.save_all()
+        with self._lock:
+            profile = self._profiles.pop(user_id, _MISSING)
+            if profile is _MISSING:
+                return False
+            self._by_role[self._role_of(profile)].pop(user_id, None)
+            self.append_record("delete", user_id)
             return True
-        return False
+    
+    def _materialize_many(self, user_ids: List[str]) -> List[UserProfile]:
+        """
+        Materialize profiles for a list of IDs taken without the lock,
+        leaving out any deleted since the list was taken.
+        """
+        profiles = [self._materialize(user_id) for user_id in user_ids]
+        return [profile for profile in profiles if profile is not None]
     
     def get_all_profiles(self) -> List[UserProfile]:
         """Get all user profiles."""
-        return list(self.profiles.values())
+        return self._materialize_many(list(self._profiles))
     
     def get_profiles_by_role(self, role: str) -> List[UserProfile]:
         """
@@ -149,11 +624,11 @@ class ProfileStorage:
         Returns:
             List[UserProfile]: Profiles matching the role
         """
-        return [p for p in self.profiles.values() if p.role.value == role]
+        return self._materialize_many(list(self._by_role.get(role, ())))
     
     def add_activity_to_profile(self, user_id: str, activity_type: str, 
                                duration_minutes: int, calories_burned: int, 
-                               notes: str = "") -> bool:
+                               notes: str = "") -> Optional[Tuple[UserProfile, ActivityEntry]]:
         """
         Add an activity to a user's profile.
         
@@ -165,15 +640,49 @@ class ProfileStorage:
             notes (str): Optional notes
         
         Returns:
-            bool: True if successful, False if user not found
+            Optional[Tuple[UserProfile, ActivityEntry]]: The updated profile
+            and the new entry, or None if user not found
         """
-        profile = self.get_profile(user_id)
-        if not profile:
-            return False
+        with self._lock:
+            profile = self.get_profile(user_id)
+            if not profile:
+                return None
+            
+            activity = profile.add_activity(activity_type, duration_minutes, calories_burned, notes)
+            self.append_record("activity", user_id, {"activity": activity.to_dict()})
+            return profile, activity
+    
+    def add_activities_bulk(self, user_id: str,
+                            activities: List[dict]) -> Optional[Tuple[UserProfile, List[ActivityEntry]]]:
+        """
+        Add several activities to a user's profile as a single change.
+        
+        All entries are written as one log record, so importing a batch
+        costs one record instead of one per activity.
         
-        profile.add_activity(activity_type, duration_minutes, calories_burned, notes)
-        self.save_all()
-        return True
+        Args:
+            user_id (str): The user ID
+            activities (list): Dicts with activity_type, duration_minutes,
+                calories_burned and optional notes
+        
+        Returns:
+            Optional[Tuple[UserProfile, List[ActivityEntry]]]: The updated
+            profile and the new entries, or None if user not found
+        """
+        with self._lock:
+            profile = self.get_profile(user_id)
+            if not profile:
+                return None
+            
+            entries = [
+                ActivityEntry(a["activity_type"], a["duration_minutes"],
+                              a["calories_burned"], a.get("notes", ""))
+                for a in activities
+            ]
+            profile.extend_activities(entries)
+            self.append_record("activities", user_id,
+                               {"activities": [entry.to_dict() for entry in entries]})
+            return profile, entries
 
 
 class InMemoryProfileStorage:
@@ -227,11 +736,11 @@ class InMemoryProfileStorage:
     
     def add_activity_to_profile(self, user_id: str, activity_type: str,
                                duration_minutes: int, calories_burned: int,
-                               notes: str = "") -> bool:
-        """Add an activity to a user's profile."""
+                               notes: str = "") -> Optional[Tuple[UserProfile, ActivityEntry]]:
+        """Add an activity to a user's profile; returns (profile, entry), or None."""
         profile = self.get_profile(user_id)
         if not profile:
-            return False
+            return None
         
-        profile.add_activity(activity_type, duration_minutes, calories_burned, notes)
-        return True
+        activity = profile.add_activity(activity_type, duration_minutes, calories_burned, notes)
+        return profile, activity
@@ -8,11 +8,13 @@ profile creation, activity logging, and data persistence.
 
 import json
 import os
+import threading
+import time
 from .models import UserProfile, UserRole, ActivityEntry
-from .storage import ProfileStorage, InMemoryProfileStorage
+from .storage import ProfileStorage, InMemoryProfileStorage, msgpack
 from .views import (
     create_profile, get_profile, update_profile, delete_profile,
-    list_profiles, add_activity, get_user_statistics
+    list_profiles, add_activity, add_activities_bulk, get_user_statistics
 )
 
 
@@ -80,8 +82,9 @@ def test_in_memory_storage():
     print(f"✓ Retrieved profile: {retrieved.name}")
     
     # Test activity addition
-    success = storage.add_activity_to_profile("user001", "walking", 20, 100, "Morning walk")
-    print(f"✓ Added activity to profile: {success}")
+    updated, activity = storage.add_activity_to_profile("user001", "walking", 20, 100, "Morning walk")
+    assert updated.get_total_activities() == 1 and activity.activity_type == "walking"
+    print(f"✓ Added activity to profile: {updated.name}")
     
     # Test listing
     all_profiles = storage.get_all_profiles()
@@ -112,12 +115,21 @@ def test_file_storage():
     # Create profiles
     p1 = storage.create_profile("student_101", "Emma Wilson", 15, "student")
     p2 = storage.create_profile("teacher_101", "Dr. Lisa Chen", 40, "gym_teacher")
-    print(f"✓ Created and saved 2 profiles to disk")
+    print(f"✓ Created 2 profiles")
     
     # Add activities
     storage.add_activity_to_profile("student_101", "running", 25, 250)
     storage.add_activity_to_profile("student_101", "cycling", 40, 400)
-    print(f"✓ Added activities and saved to disk")
+    storage.add_activities_bulk("teacher_101", [
+        {"activity_type": "walking", "duration_minutes": 30, "calories_burned": 120},
+        {"activity_type": "tennis", "duration_minutes": 60, "calories_burned": 450}
+    ])
+    print(f"✓ Added activities")
+    
+    # Nothing is written until the pending changes are flushed
+    assert not os.path.exists(test_file)
+    storage.flush()
+    print(f"✓ Flushed pending changes to disk")
     
     # Create new storage instance and load from file
     storage2 = ProfileStorage(test_file)
@@ -127,17 +139,183 @@ def test_file_storage():
     loaded_profile = storage2.get_profile("student_101")
     print(f"✓ Verified persistence: {loaded_profile.name} with {loaded_profile.get_total_activities()} activities")
     
-    # Check file exists and is valid JSON
+    # Reloading a live instance keeps changes that were still pending
+    storage2.create_profile("student_102", "Owen Hall", 14, "student")
+    storage2.load_all()
+    assert storage2.get_profile("student_102") is not None
+    print(f"✓ Reload kept unflushed changes")
+    
+    loaded = storage2.get_profiles_bulk(["student_101", "teacher_101", "missing"])
+    assert sorted(loaded) == ["student_101", "teacher_101"]
+    assert loaded["teacher_101"].get_total_calories_burned() == 570
+    print(f"✓ Bulk lookup returned {len(loaded)} profiles, including the batch-added activities")
+    
+    # Check file exists and every line is a valid JSON record
     if os.path.exists(test_file):
         with open(test_file, 'r') as f:
-            data = json.load(f)
-        print(f"✓ File contains {len(data)} profiles in valid JSON format")
+            records = [json.loads(line) for line in f]
+        print(f"✓ File contains {len(records)} change records in valid JSON-Lines format")
         
         # Clean up
         os.remove(test_file)
         print(f"✓ Cleaned up test file")
 
 
+def test_storage_log_compaction():
+    """Test compaction of the storage change log."""
+    print_section("Testing Storage Log Compaction")
+    
+    test_file = "/tmp/test_profiles_compaction.json"
+    if os.path.exists(test_file):
+        os.remove(test_file)
+    
+    storage = ProfileStorage(test_file)
+    storage.MIN_COMPACTION_BYTES = 0
+    storage.create_profile("student_201", "Noah Brown", 14, "student")
+    for _ in range(20):
+        storage.add_activity_to_profile("student_201", "swimming", 20, 180)
+    storage.flush()
+    
+    with open(test_file, 'r') as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1 and records[0]["op"] == "snapshot"
+    print(f"✓ Log compacted into a single snapshot record")
+    
+    reloaded = ProfileStorage(test_file).get_profile("student_201")
+    assert reloaded.get_total_activities() == 20
+    print(f"✓ Reloaded snapshot: {reloaded.name} with {reloaded.get_total_activities()} activities")
+    
+    # Files in the older single-document format are still readable
+    with open(test_file, 'w') as f:
+        json.dump({"student_201": reloaded.to_dict()}, f, indent=2)
+    legacy = ProfileStorage(test_file)
+    print(f"✓ Loaded legacy JSON file with {len(legacy.get_all_profiles())} profile(s)")
+    
+    legacy.flush()
+    with open(test_file, 'r') as f:
+        assert json.loads(f.readline())["op"] == "snapshot"
+    print(f"✓ Migrated legacy JSON file to the change log format")
+    
+    # A failed flush is recovered by rewriting the file, not by appending
+    # the same records again
+    os.remove(test_file)
+    storage = ProfileStorage(test_file)
+    storage.create_profile("student_204", "Ella Ward", 15, "student")
+    storage.flush()
+    storage.add_activity_to_profile("student_204", "running", 30, 300)
+    real_fsync = os.fsync
+    def failing_fsync(fd):
+        os.fsync = real_fsync
+        raise OSError("simulated fsync failure")
+    os.fsync = failing_fsync
+    try:
+        storage.flush()
+        assert False, "flush should have raised"
+    except OSError:
+        pass
+    finally:
+        os.fsync = real_fsync
+    storage.flush()
+    assert ProfileStorage(test_file).get_profile("student_204").get_total_activities() == 1
+    print(f"✓ Recovered from a failed flush without duplicating records")
+    
+    # A damaged record in the middle of the log only loses that record and
+    # the changes that depended on it
+    os.remove(test_file)
+    storage = ProfileStorage(test_file)
+    storage.create_profile("student_202", "Ava Green", 15, "student")
+    storage.create_profile("student_203", "Liam Gray", 16, "student")
+    storage.add_activity_to_profile("student_202", "running", 30, 300)
+    storage.add_activity_to_profile("student_203", "rowing", 25, 200)
+    storage.close()
+    with open(test_file, 'rb') as f:
+        lines = f.readlines()
+    lines[0] = lines[0][:len(lines[0]) // 2] + b'\n'
+    with open(test_file, 'wb') as f:
+        f.writelines(lines)
+    damaged = ProfileStorage(test_file)
+    assert damaged.get_profile("student_202") is None
+    assert damaged.get_profile("student_203").get_total_activities() == 1
+    print(f"✓ Skipped a corrupt record and its orphaned activity on load")
+    
+    # Records that parse but hold an incomplete profile are skipped as well
+    with open(test_file, 'ab') as f:
+        f.write(b'{"op":"upsert","user_id":"student_205","profile":{}}\n')
+    damaged = ProfileStorage(test_file)
+    assert damaged.get_profile("student_205") is None
+    assert len(damaged.get_all_profiles()) == 1
+    print(f"✓ Skipped an incomplete profile record on load")
+    
+    os.remove(test_file)
+
+
+def test_background_flush():
+    """Test flushing pending records from the background thread."""
+    print_section("Testing Background Flush")
+    
+    test_file = "/tmp/test_profiles_background.json"
+    if os.path.exists(test_file):
+        os.remove(test_file)
+    
+    storage = ProfileStorage(test_file, flush_interval=0.01)
+    storage.create_profile("student_401", "Leo Park", 13, "student")
+    
+    deadline = time.time() + 2
+    while not os.path.exists(test_file) and time.time() < deadline:
+        time.sleep(0.01)
+    assert os.path.exists(test_file)
+    print(f"✓ Background thread flushed the new profile to disk")
+    
+    # Mutations keep going while the background flush is stuck in fsync
+    entered, release = threading.Event(), threading.Event()
+    real_fsync = os.fsync
+    def slow_fsync(fd):
+        entered.set()
+        release.wait(5)
+        real_fsync(fd)
+    os.fsync = slow_fsync
+    try:
+        storage.add_activity_to_profile("student_401", "hiking", 60, 400)
+        assert entered.wait(2)
+        start = time.time()
+        storage.add_activity_to_profile("student_401", "hiking", 30, 200)
+        elapsed = time.time() - start
+    finally:
+        release.set()
+        os.fsync = real_fsync
+    assert elapsed < 1
+    print(f"✓ Mutation returned in {elapsed * 1000:.1f} ms during a slow flush")
+    
+    storage.close()
+    assert ProfileStorage(test_file).get_profile("student_401").get_total_activities() == 2
+    os.remove(test_file)
+
+
+def test_msgpack_storage():
+    """Test the optional MessagePack storage format."""
+    print_section("Testing MessagePack Storage")
+    
+    if msgpack is None:
+        print("- Skipped: msgpack is not installed")
+        return
+    
+    test_file = "/tmp/test_profiles.msgpack"
+    if os.path.exists(test_file):
+        os.remove(test_file)
+    
+    storage = ProfileStorage(test_file, storage_format='msgpack')
+    storage.create_profile("student_301", "Mia Lopez", 15, "student")
+    storage.add_activity_to_profile("student_301", "yoga", 30, 120)
+    storage.flush()
+    print(f"✓ Wrote profiles in MessagePack format")
+    
+    loaded = ProfileStorage(test_file, storage_format='msgpack').get_profile("student_301")
+    assert loaded.get_total_activities() == 1
+    print(f"✓ Reloaded: {loaded.name} with {loaded.get_total_activities()} activities")
+    
+    os.remove(test_file)
+
+
 def test_api_views():
     """Test the API view functions."""
     print_section("Testing API Views")
@@ -161,9 +339,25 @@ def test_api_views():
     # Test add_activity
     response = add_activity("api_student_1", "running", 30, 300, "Morning run")
     print(f"✓ Add activity API: {response['message']}")
+    assert response['data']['latest_activity']['activity_type'] == "running"
     print(f"  - Total activities: {response['data']['stats']['total_activities']}")
     print(f"  - Total calories: {response['data']['stats']['total_calories_burned']}")
     
+    # Test add_activities_bulk
+    response = add_activities_bulk("api_student_1", [
+        {"activity_type": "cycling", "duration_minutes": 20, "calories_burned": 150},
+        {"activity_type": "yoga", "duration_minutes": 40, "calories_burned": 120, "notes": "Stretching"}
+    ])
+    assert response['status_code'] == 201
+    assert len(response['data']['added_activities']) == 2
+    print(f"✓ Bulk add activities API: {response['message']}")
+    print(f"  - Total activities: {response['data']['stats']['total_activities']}")
+    
+    response = add_activities_bulk("api_student_1", [{"activity_type": "running", "duration_minutes": 0,
+                                                      "calories_burned": 10}])
+    assert response['status_code'] == 400
+    print(f"✓ Bulk add rejected invalid batch: {response['message']}")
+    
     # Test list_profiles
     create_profile("api_student_2", "Test Student 2", 17, "student")
     create_profile("api_teacher_1", "Test Teacher", 50, "gym_teacher")
@@ -174,6 +368,11 @@ def test_api_views():
     response = list_profiles(role="student")
     print(f"✓ List student profiles API: Retrieved {len(response['data'])} students")
     
+    # Roles that aren't strings, e.g. from a JSON body, are rejected cleanly
+    assert create_profile("api_student_3", "Bad Role", 16, ["student"])['status_code'] == 400
+    assert list_profiles(role=["student"])['status_code'] == 400
+    print(f"✓ Non-string roles rejected with status 400")
+    
     # Test get_user_statistics
     response = get_user_statistics("api_student_1")
     print(f"✓ User statistics API: {response['message']}")
@@ -185,6 +384,17 @@ def test_api_views():
     print(f"✓ Update profile API: {response['message']}")
     print(f"  - New age: {response['data']['age']}")
     
+    # Repeating the same update changes nothing and reuses the cached data
+    repeated = update_profile("api_student_1", age=17)
+    assert repeated['data'] is response['data']
+    print(f"✓ Idempotent update reused the cached profile data")
+    
+    # An invalid role is rejected without touching the profile or the role index
+    assert update_profile("api_student_1", role=None)['status_code'] == 400
+    assert get_profile("api_student_1")['data']['role'] == "student"
+    assert list_profiles(role="student")['success']
+    print(f"✓ Update with an invalid role rejected with status 400")
+    
     # Test delete_profile
     response = delete_profile("api_student_2")
     print(f"✓ Delete profile API: {response['message']}")
@@ -227,6 +437,9 @@ def run_all_tests():
     test_user_profile_model()
     test_in_memory_storage()
     test_file_storage()
+    test_storage_log_compaction()
+    test_background_flush()
+    test_msgpack_storage()
     test_api_views()
     test_error_handling()
     
@@ -6,41 +6,61 @@ user profiles and activity management. It includes error handling and
 response formatting.
 """
 
+from sys import intern
+
 from .storage import ProfileStorage
 from .serializers import UserProfileSerializer
 from .models import UserRole
 
 
-# Global storage instance
+# Global storage instance, shared by all requests
 storage = ProfileStorage()
 
+# Role values accepted by the API
+_VALID_ROLES = frozenset(role.value for role in UserRole)
+
 
 class APIResponse:
     """Helper class for consistent API response formatting."""
     
+    # Copying a prebuilt dict is cheaper than building one from a literal
+    _SUCCESS_TEMPLATE = {"success": True, "message": "", "data": None, "status_code": 200}
+    _ERROR_TEMPLATE = {"success": False, "message": "", "status_code": 400}
+    
     @staticmethod
     def success(data, message="Success", status_code=200):
         """Return a success response."""
-        return {
-            "success": True,
-            "message": message,
-            "data": data,
-            "status_code": status_code
-        }
+        response = APIResponse._SUCCESS_TEMPLATE.copy()
+        response["message"] = message
+        response["data"] = data
+        response["status_code"] = status_code
+        return response
     
     @staticmethod
     def error(message, status_code=400, error_details=None):
         """Return an error response."""
-        response = {
-            "success": False,
-            "message": message,
-            "status_code": status_code
-        }
+        response = APIResponse._ERROR_TEMPLATE.copy()
+        response["message"] = message
+        response["status_code"] = status_code
         if error_details:
             response["error_details"] = error_details
         return response
 
 
+def _validate_activity(activity_type, duration_minutes, calories_burned):
+    """Check activity fields, returning an error message or None if valid."""
+    if not activity_type:
+        return "activity_type is required"
+    
+    if not isinstance(duration_minutes, int) or duration_minutes <= 0:
+        return "duration_minutes must be a positive integer"
+    
+    if not isinstance(calories_burned, int) or calories_burned < 0:
+        return "calories_burned must be a non-negative integer"
+    
+    return None
+
+
 def create_profile(user_id: str, name: str, age: int, role: str):
     """
     Create a new user profile.
@@ -62,9 +82,13 @@ def create_profile(user_id: str, name: str, age: int, role: str):
         if not isinstance(age, int) or age < 0 or age > 150:
             return APIResponse.error("age must be a valid integer between 0 and 150", status_code=400)
         
-        if role not in ["student", "gym_teacher"]:
+        if not isinstance(role, str) or role not in _VALID_ROLES:
             return APIResponse.error("role must be 'student' or 'gym_teacher'", status_code=400)
         
+        # Store one shared copy of each ID so lookups can hit the identity fast path
+        if isinstance(user_id, str):
+            user_id = intern(user_id)
+        
         # Create profile
         profile = storage.create_profile(user_id, name, age, role)
         serialized = UserProfileSerializer.serialize(profile)
@@ -77,7 +101,7 @@ def create_profile(user_id: str, name: str, age: int, role: str):
     
     except ValueError as e:
         return APIResponse.error(str(e), status_code=400)
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -100,7 +124,7 @@ def get_profile(user_id: str):
         serialized = UserProfileSerializer.serialize(profile)
         return APIResponse.success(serialized, message="Profile retrieved successfully")
     
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -126,7 +150,7 @@ def update_profile(user_id: str, **kwargs):
     
     except ValueError as e:
         return APIResponse.error(str(e), status_code=400)
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -148,7 +172,7 @@ def delete_profile(user_id: str):
         
         return APIResponse.success(None, message="Profile deleted successfully")
     
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -164,7 +188,7 @@ def list_profiles(role: str = None):
     """
     try:
         if role:
-            if role not in ["student", "gym_teacher"]:
+            if not isinstance(role, str) or role not in _VALID_ROLES:
                 return APIResponse.error("Invalid role. Must be 'student' or 'gym_teacher'", status_code=400)
             profiles = storage.get_profiles_by_role(role)
         else:
@@ -176,7 +200,7 @@ def list_profiles(role: str = None):
             message=f"Retrieved {len(profiles)} profile(s)"
         )
     
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -193,29 +217,24 @@ def add_activity(user_id: str, activity_type: str, duration_minutes: int,
         notes (str): Optional notes
     
     Returns:
-        dict: API response with updated profile data
+        dict: API response with the new activity and updated stats
     """
     try:
         # Validate input
-        if not activity_type:
-            return APIResponse.error("activity_type is required", status_code=400)
-        
-        if not isinstance(duration_minutes, int) or duration_minutes <= 0:
-            return APIResponse.error("duration_minutes must be a positive integer", status_code=400)
-        
-        if not isinstance(calories_burned, int) or calories_burned < 0:
-            return APIResponse.error("calories_burned must be a non-negative integer", status_code=400)
+        error = _validate_activity(activity_type, duration_minutes, calories_burned)
+        if error:
+            return APIResponse.error(error, status_code=400)
         
         # Add activity
-        success = storage.add_activity_to_profile(
+        added = storage.add_activity_to_profile(
             user_id, activity_type, duration_minutes, calories_burned, notes
         )
         
-        if not success:
+        if added is None:
             return APIResponse.error(f"Profile with user_id '{user_id}' not found", status_code=404)
         
-        profile = storage.get_profile(user_id)
-        serialized = UserProfileSerializer.serialize(profile)
+        profile, activity = added
+        serialized = UserProfileSerializer.serialize_add_activity_response(profile, activity)
         
         return APIResponse.success(
             serialized,
@@ -225,7 +244,57 @@ def add_activity(user_id: str, activity_type: str, duration_minutes: int,
     
     except ValueError as e:
         return APIResponse.error(str(e), status_code=400)
-    except Exception as e:
+    except (KeyError, OSError) as e:
+        return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
+
+
+def add_activities_bulk(user_id: str, activities: list):
+    """
+    Add several activities to a user's profile in one call.
+    
+    Args:
+        user_id (str): The user ID
+        activities (list): Dicts with activity_type, duration_minutes,
+            calories_burned and optional notes
+    
+    Returns:
+        dict: API response with the new activities and updated stats
+    """
+    try:
+        # Validate the whole batch before changing anything
+        if not isinstance(activities, list) or not activities:
+            return APIResponse.error("activities must be a non-empty list", status_code=400)
+        
+        for index, activity in enumerate(activities):
+            if not isinstance(activity, dict):
+                return APIResponse.error(f"activities[{index}]: must be a dict", status_code=400)
+            
+            error = _validate_activity(
+                activity.get("activity_type"),
+                activity.get("duration_minutes"),
+                activity.get("calories_burned")
+            )
+            if error:
+                return APIResponse.error(f"activities[{index}]: {error}", status_code=400)
+        
+        # Add activities
+        added = storage.add_activities_bulk(user_id, activities)
+        
+        if added is None:
+            return APIResponse.error(f"Profile with user_id '{user_id}' not found", status_code=404)
+        
+        profile, entries = added
+        serialized = UserProfileSerializer.serialize_add_activities_response(profile, entries)
+        
+        return APIResponse.success(
+            serialized,
+            message=f"Added {len(activities)} activities",
+            status_code=201
+        )
+    
+    except ValueError as e:
+        return APIResponse.error(str(e), status_code=400)
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)
 
 
@@ -245,20 +314,21 @@ def get_user_statistics(user_id: str):
         if not profile:
             return APIResponse.error(f"Profile with user_id '{user_id}' not found", status_code=404)
         
+        total_activities = profile.get_total_activities()
+        total_calories = profile.get_total_calories_burned()
         stats = {
             "user_id": user_id,
             "name": profile.name,
             "role": profile.role.value,
-            "total_activities": profile.get_total_activities(),
+            "total_activities": total_activities,
             "total_activity_time_minutes": profile.get_total_activity_time(),
-            "total_calories_burned": profile.get_total_calories_burned(),
+            "total_calories_burned": total_calories,
             "average_calories_per_activity": (
-                profile.get_total_calories_burned() // profile.get_total_activities()
-                if profile.get_total_activities() > 0 else 0
+                total_calories // total_activities if total_activities > 0 else 0
             )
         }
         
         return APIResponse.success(stats, message="Statistics retrieved successfully")
     
-    except Exception as e:
+    except (KeyError, OSError) as e:
         return APIResponse.error(f"Internal server error: {str(e)}", status_code=500)